@@ -4,13 +4,21 @@ import faiss
 import google.generativeai as genai
 import os
 from tqdm import tqdm
+import sys
 import time
 from dotenv import load_dotenv
 
+# Chunks are built exactly as the engine rebuilds them (Zomato_chatbot_app/corpus.py).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../Zomato_chatbot_app'))
+from corpus import build_text_chunk
+
 def create_faiss_db_with_gemini():
     """
     Generates embeddings from a corpus using Google Gemini, builds a FAISS index,
     and saves the index and corresponding metadata.
+
+    Byte-identical text chunks (e.g. a dish listed twice on one menu) are embedded
+    once and share a single vector; the metadata records which dish rows map to it.
     """
     # 1. Configure the Gemini API
     # Explicitly load the .env file from the current directory
@@ -27,17 +35,26 @@ def create_faiss_db_with_gemini():
 
     # 2. Load the optimized corpus
     print("Loading corpus...")
-    with open('./../Structured_data/optimized_corpus.json', 'r', encoding='utf-8') as f:
+    with open('./../Structured_Data/optimized_corpus.json', 'r', encoding='utf-8') as f:
         corpus = json.load(f)
 
-    text_chunks = [item['text_chunk'] for item in corpus]
-    metadata_corpus = [{'metadata': item['metadata'], 'text_chunk': item['text_chunk']} for item in corpus]
+    # Build each dish's text from the normalized corpus and group identical texts.
+    template = corpus['chunk_template']
+    restaurants = corpus['restaurants']
+    dish_ids_by_text = {}
+    for dish_id, dish in enumerate(corpus['dishes']):
+        text = build_text_chunk(template, restaurants[dish['restaurant']], dish)
+        dish_ids_by_text.setdefault(text, []).append(dish_id)
+
+    text_chunks = list(dish_ids_by_text)
+    print(f"{len(corpus['dishes'])} dishes, {len(text_chunks)} distinct text chunks to embed.")
 
     # 3. Generate embeddings using Google Gemini
     print("Generating embeddings with Google Gemini... (This may take a while)")
     model_name = 'models/embedding-001'
     
     embeddings = []
+    embedded_texts = []
     batch_size = 100  # The Gemini API has a limit on elements per request
     
     for i in tqdm(range(0, len(text_chunks), batch_size)):
@@ -46,11 +63,13 @@ def create_faiss_db_with_gemini():
             # Generate embeddings for the batch
             response = genai.embed_content(model=model_name, content=batch, task_type="RETRIEVAL_DOCUMENT")
             embeddings.extend(response['embedding'])
+            embedded_texts.extend(batch)
             # Respect API rate limits
             time.sleep(1) 
         except Exception as e:
             print(f"An error occurred during embedding generation: {e}")
             # Decide how to handle the error: stop, skip batch, etc.
+            # Skipped texts get no vector, so their dishes are left out of the index.
             print(f"Skipping batch starting at index {i}.")
             continue
 
@@ -69,6 +88,14 @@ def create_faiss_db_with_gemini():
     index.add(embeddings_np)
     print(f"FAISS index built successfully. Total vectors in index: {index.ntotal}")
 
+    # Vector i is shared by every dish row in vectors[i].
+    metadata_corpus = {
+        'chunk_template': template,
+        'restaurants': restaurants,
+        'dishes': corpus['dishes'],
+        'vectors': [dish_ids_by_text[text] for text in embedded_texts],
+    }
+
     # 5. Save the FAISS index and the metadata corpus
     index_filename = "./../faiss_index/faiss_index.bin"
     metadata_filename = "./../faiss_index/metadata_corpus.json"
@@ -0,0 +1,268 @@
+"""
+autocomplete.py
+---------------
+Typo-tolerant dish / restaurant name suggestions for the chat input.
+
+- Builds an in-memory trie over the distinct words of every restaurant and dish
+  name in `knowledge_base.json`, with a posting list (word -> names) per word.
+- Every typed word is matched with a bounded edit distance that grows with its
+  length (0 for 1-2 characters, 1 for 3-4, 2 beyond; the first letter must match);
+  the last word is matched as a prefix because the user is still typing it.
+  Word order does not matter.
+- Candidate matches come from a deletion index over every trie path
+  (symmetric delete: a path within edit distance 2 of the typed word shares a
+  "minus up to 2 letters" key with it), so only a handful of paths are verified
+  instead of walking the trie.
+- Each trie node caches its most popular names, so single-word lookups never
+  walk whole posting lists. Per-word matches and their name scores are memoized,
+  so on each keystroke only the word being typed is searched.
+
+Build once per process (`manual_context.load_knowledge_base` caches it for the
+app and the chat commands); a lookup then takes well under a millisecond.
+"""
+
+import re
+import json
+import math
+import heapq
+from collections import namedtuple
+from corpus import parse_num_reviews
+
+Suggestion = namedtuple("Suggestion", ["name", "kind", "command"])
+
+TOP_PER_NODE = 10
+MATCH_CACHE_SIZE = 4096
+MAX_DISTANCE = 2
+
+
+def _normalize(text):
+    text = text.lower().replace("'", "")
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+
+def _max_distance(length):
+    if length <= 2:
+        return 0
+    return 1 if length <= 4 else MAX_DISTANCE
+
+
+def _deletes(word, max_deletes):
+    """`word` plus every string obtained by deleting up to `max_deletes` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_deletes):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def _next_row(token, ch, depth, prev, max_dist):
+    """
+    Levenshtein row for a path extended by `ch` (now `depth` long): row[i] is the
+    distance between token[:i] and the path, capped at max_dist + 1. Only the band
+    |i - depth| <= max_dist can stay under the cap, so only those cells are computed.
+    """
+    cap = max_dist + 1
+    row = [cap] * (len(token) + 1)
+    if depth < cap:
+        row[0] = depth
+    lo = depth - max_dist if depth > max_dist else 1
+    if lo > len(token):
+        return row  # the path is already too much longer than the token
+    left = row[lo - 1]
+    for i in range(lo, min(len(token), depth + max_dist) + 1):
+        value = prev[i - 1] if token[i - 1] == ch else prev[i - 1] + 1
+        if prev[i] + 1 < value:
+            value = prev[i] + 1
+        if left + 1 < value:
+            value = left + 1
+        row[i] = left = value if value < cap else cap
+    return row
+
+
+class _TrieNode:
+    __slots__ = ("children", "word", "words", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.word = None  # word id if a vocabulary word ends here
+        self.words = ()   # every word id in this subtree
+        self.top = ()     # most popular entry ids in this subtree
+
+
+class NameAutocompleter:
+    def __init__(self, entries):
+        """`entries` is a list of (name, kind, popularity) tuples."""
+        self._suggestions = []
+        self._popularity = []
+        self._postings = []  # word id -> set of entry ids
+        self._match_cache = {}
+        self._score_cache = {}
+        vocabulary = {}
+        for entry_id, (name, kind, popularity) in enumerate(entries):
+            command = "menu-list" if kind == "restaurant" else "serves-dish-item"
+            self._suggestions.append(Suggestion(name, kind, f"{command} {name}"))
+            self._popularity.append(popularity)
+            for word in _normalize(name).split():
+                if word not in vocabulary:
+                    vocabulary[word] = len(vocabulary)
+                    self._postings.append(set())
+                self._postings[vocabulary[word]].add(entry_id)
+
+        self._root = _TrieNode()
+        for word, word_id in vocabulary.items():
+            node = self._root
+            for ch in word:
+                node = node.children.setdefault(ch, _TrieNode())
+            node.word = word_id
+        self._compute_subtrees()
+
+        # Deletion index over every trie path. Lev(a, b) == Lev(a[1:], b[1:]) when the
+        # first letters match, so only the tail is varied; the first letter starts every key.
+        self._paths = {}  # trie node -> its path without the first letter
+        self._deletion_index = {}
+        stack = list(self._root.children.items())
+        while stack:
+            path, node = stack.pop()
+            self._paths[node] = path[1:]
+            for tail in _deletes(path[1:], MAX_DISTANCE):
+                self._deletion_index.setdefault(path[0] + tail, []).append(node)
+            stack.extend((path + ch, child) for ch, child in node.children.items())
+
+    @classmethod
+    def from_knowledge_base(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            knowledge_base = json.load(f)
+
+        dishes = {}
+        restaurants = {}
+        for restaurant in knowledge_base:
+            menu = restaurant.get("restaurant_menu") or []
+            # Restaurants rank above dishes of similar popularity.
+            restaurants[restaurant["restaurant_name"]] = 1000 + len(menu)
+            for dish in menu:
+                name = dish.get("dish_name")
+                if name:
+                    dishes[name] = dishes.get(name, 0) + 1 + (parse_num_reviews(dish.get("num_reviews")) or 0)
+
+        entries = [(name, "restaurant", pop) for name, pop in restaurants.items()]
+        entries += [(name, "dish", math.log1p(pop)) for name, pop in dishes.items()]
+        return cls(entries)
+
+    def __len__(self):
+        return len(self._suggestions)
+
+    def _compute_subtrees(self):
+        # Iterative post-order so long words cannot hit the recursion limit.
+        order, stack = [], [self._root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+        for node in reversed(order):
+            words = [node.word] if node.word is not None else []
+            entries = set(self._postings[node.word]) if node.word is not None else set()
+            for child in node.children.values():
+                words.extend(child.words)
+                entries.update(child.top)
+            node.words = tuple(words)
+            node.top = tuple(heapq.nlargest(TOP_PER_NODE, entries, key=self._popularity.__getitem__))
+
+    @staticmethod
+    def _memoized(cache, key, compute, *args):
+        value = cache.get(key)
+        if value is None:
+            if len(cache) >= MATCH_CACHE_SIZE:
+                cache.clear()
+            value = cache[key] = compute(*args)
+        return value
+
+    def _match_word(self, token, prefix):
+        return self._memoized(self._match_cache, (token, prefix), self._search, token, prefix)
+
+    def _token_scores(self, token, prefix):
+        return self._memoized(self._score_cache, (token, prefix), self._entry_distances, token, prefix)
+
+    def _search(self, token, prefix):
+        """
+        Fuzzy-matches one typed word against the vocabulary.
+        Returns [(distance, trie node)] sorted by distance: nodes ending a matching
+        word, or (prefix=True) nodes whose path is a matching prefix.
+        """
+        max_dist = _max_distance(len(token))
+        # The first character must match exactly (typos there are rare).
+        first, tail = token[0], token[1:]
+        candidates = set()
+        for key in _deletes(tail, max_dist):
+            candidates.update(self._deletion_index.get(first + key, ()))
+
+        # Verify each candidate with Levenshtein rows along its path; candidates
+        # share prefixes, so rows are memoized per path.
+        rows = {"": [min(i, max_dist + 1) for i in range(len(tail) + 1)]}
+        matches = []
+        for node in candidates:
+            if prefix or node.word is not None:
+                path = self._paths[node]
+                depth = len(path)
+                while path[:depth] not in rows:
+                    depth -= 1
+                row = rows[path[:depth]]
+                for depth in range(depth + 1, len(path) + 1):
+                    row = rows[path[:depth]] = _next_row(tail, path[depth - 1], depth, row, max_dist)
+                if row[-1] <= max_dist:
+                    matches.append((row[-1], node))
+        matches.sort(key=lambda m: (m[0], len(self._paths[m[1]])))
+        if not prefix:
+            return matches
+
+        # A matched prefix covers its whole subtree; drop descendants that match no closer.
+        kept, covered = [], set()
+        for dist, node in matches:
+            path = self._paths[node]
+            if not any(path[:depth] in covered for depth in range(len(path))):
+                kept.append((dist, node))
+                covered.add(path)
+        return kept
+
+    def _entry_distances(self, token, prefix):
+        """{entry_id: best distance} over every name containing a word matching `token`."""
+        best = {}
+        for dist, node in self._match_word(token, prefix):  # closest first, so the first hit is the best
+            for word_id in (node.words if prefix else (node.word,)):
+                for entry_id in self._postings[word_id]:
+                    best.setdefault(entry_id, dist)
+        return best
+
+    def suggest(self, text, limit=8, kind=None):
+        """Ranked suggestions for a (possibly misspelled, partially typed) name."""
+        tokens = _normalize(text).split()
+        if not tokens:
+            return []
+
+        *complete, last = tokens
+        if not complete and kind is None:
+            # Single word: the per-node top lists already hold the best candidates.
+            scores = {}
+            for dist, node in self._match_word(last, prefix=True):
+                for entry_id in node.top:
+                    scores.setdefault(entry_id, dist)
+        else:
+            per_token = [self._token_scores(token, False) for token in complete]
+            per_token.append(self._token_scores(last, True))
+            # Walk the smallest candidate set and probe the others.
+            per_token.sort(key=len)
+            smallest, *others = per_token
+            scores = {}
+            for entry_id, dist in smallest.items():
+                for token_scores in others:
+                    other = token_scores.get(entry_id)
+                    if other is None:
+                        break
+                    dist += other
+                else:
+                    scores[entry_id] = dist
+
+        if kind:
+            scores = {e: d for e, d in scores.items() if self._suggestions[e].kind == kind}
+        ranked = heapq.nsmallest(limit, scores, key=lambda e: (scores[e], -self._popularity[e], self._suggestions[e].name))
+        return [self._suggestions[e] for e in ranked]
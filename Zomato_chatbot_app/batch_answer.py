@@ -0,0 +1,171 @@
+"""
+batch_answer.py
+---------------
+Runs a JSONL file of questions through the RAG engine, for QA runs and for
+pre-computing answers.
+
+- Streams queries from the input file (never loads it whole).
+- Embeds each chunk of queries with one batched API request, then answers them
+  on a bounded worker pool, paced by a rate limiter.
+- Streams one JSON line per query to the output file as soon as it is answered,
+  with the outcome and per-stage timings.
+- The output file doubles as the checkpoint: on restart, ids already present are
+  skipped, so a crashed run resumes where it stopped. Only successful answers go
+  there; failed turns (engine errors, timeouts, degraded LLM-less answers) are
+  logged to `<output>.failed` instead and retried on the next run.
+
+Input lines look like {"id": "q1", "query": "Which restaurants serve momos?"};
+use --id-field / --query-field for other layouts (lines without an id are keyed
+by line number).
+
+Usage:
+    python batch_answer.py questions.jsonl answers.jsonl --workers 8 --rate 4
+"""
+
+import os
+import json
+import time
+import argparse
+import threading
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from updated_rag_engine import get_engine, get_rag_response
+from resilience import RateLimiter
+
+# Outcomes that count as done; anything else is retried when the run is resumed.
+DONE_OUTCOMES = ("answered", "cached", "command", "empty")
+
+
+def read_queries(path, id_field, query_field):
+    """Yields (id, query) pairs from a JSONL file, skipping blank or malformed lines."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping malformed line {line_number}.")
+                continue
+            if not isinstance(record, dict):
+                print(f"Skipping line {line_number}: not a JSON object.")
+                continue
+            query = record.get(query_field)
+            if not isinstance(query, str) or not query.strip():
+                print(f"Skipping line {line_number}: no text '{query_field}' field.")
+                continue
+            yield str(record.get(id_field, line_number)), query
+
+
+def load_checkpoint(output_path):
+    """Returns the ids already answered, dropping a partially written last line."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            f.truncate(len(complete))  # crash mid-write; that query is answered again
+    for line in complete.decode('utf-8').splitlines():
+        try:
+            done.add(json.loads(line)["id"])
+        except (json.JSONDecodeError, KeyError):
+            continue
+    return done
+
+
+def run_batch(input_path, output_path, id_field="id", query_field="query", workers=8, rate=4.0,
+              embed_batch_size=100, startup_timeout=120.0):
+    engine = get_engine()
+    print("Waiting for the RAG engine to load...")
+    if not engine.wait_until_ready(startup_timeout):
+        raise SystemExit(f"RAG engine not ready after {startup_timeout:.0f}s: {engine.health()['last_error']}")
+
+    done = load_checkpoint(output_path)
+    if done:
+        print(f"Resuming: {len(done)} queries already answered.")
+
+    limiter = RateLimiter(rate, burst=workers)
+    write_lock = threading.Lock()
+    # Bound queued work so the reader never runs far ahead of the workers.
+    slots = threading.BoundedSemaphore(workers * 2)
+    counts = {"answered": 0, "failed": 0}
+    started = time.monotonic()
+
+    def answer(query_id, query, out, failed):
+        limiter.acquire()
+        trace = {}
+        response = get_rag_response(query, trace=trace, record=False)
+        record = {
+            "id": query_id,
+            "query": query,
+            "answer": response,
+            "outcome": trace.get("outcome"),
+            "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in trace.get("stages", {}).items()},
+        }
+        ok = record["outcome"] in DONE_OUTCOMES
+        with write_lock:
+            target = out if ok else failed
+            target.write(json.dumps(record, ensure_ascii=False) + "\n")
+            target.flush()
+            counts["answered" if ok else "failed"] += 1
+
+    def finished(future, query_id):
+        slots.release()
+        error = future.exception()
+        if error is not None:
+            print(f"Query {query_id} failed: {error!r}")
+            with write_lock:
+                counts["failed"] += 1
+
+    queries = (item for item in read_queries(input_path, id_field, query_field) if item[0] not in done)
+    with open(output_path, 'a', encoding='utf-8') as out, open(output_path + ".failed", 'a', encoding='utf-8') as failed, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            chunk = list(islice(queries, embed_batch_size))
+            if not chunk:
+                break
+            try:
+                engine.embed_queries([query for _, query in chunk])
+            except Exception as e:
+                # Workers fall back to one embedding request per query.
+                print(f"Batched embedding failed: {e}")
+            for query_id, query in chunk:
+                slots.acquire()
+                future = pool.submit(answer, query_id, query, out, failed)
+                future.add_done_callback(lambda f, query_id=query_id: finished(f, query_id))
+            elapsed = time.monotonic() - started
+            print(f"{counts['answered']} answered, {counts['failed']} failed, {elapsed:.0f}s elapsed")
+
+    print(f"Done: {counts['answered']} answered, {counts['failed']} failed, output in {output_path}.")
+    if counts["failed"]:
+        print(f"Failed queries are logged in {output_path}.failed and will be retried on the next run.")
+
+
+def positive(kind):
+    """argparse type: `kind` (int or float) greater than zero."""
+    def parse(text):
+        value = kind(text)
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f"must be greater than 0, got {text}")
+        return value
+    parse.__name__ = kind.__name__  # argparse names the type in "invalid <type> value"
+    return parse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with the RAG engine.")
+    parser.add_argument("input", help="JSONL file with one question per line.")
+    parser.add_argument("output", help="JSONL file to append answers to (also the resume checkpoint).")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--query-field", default="query")
+    parser.add_argument("--workers", type=positive(int), default=8)
+    parser.add_argument("--rate", type=positive(float), default=4.0, help="Maximum queries started per second.")
+    parser.add_argument("--embed-batch-size", type=positive(int), default=100, help="Queries per embedding request (API max 100).")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="Seconds to wait for the engine to load.")
+    args = parser.parse_args()
+
+    run_batch(args.input, args.output, args.id_field, args.query_field, args.workers, args.rate, args.embed_batch_size,
+              args.startup_timeout)
@@ -0,0 +1,63 @@
+"""
+corpus.py
+---------
+Read-side view of the normalized metadata written by `create_vector_db.py`.
+
+The metadata file stores a restaurant table, dish rows that point at it, and a
+`vectors` list mapping each FAISS vector to the dish rows that share it (identical
+text chunks are embedded once). Entries in the familiar
+`{'metadata': {...}, 'text_chunk': ...}` shape are rebuilt on demand, so the rest
+of the engine is unaware of the storage format.
+"""
+
+import re
+import json
+
+
+def parse_num_reviews(value):
+    """Review counts are scraped as '(192)'; anything else is treated as unknown (None)."""
+    match = re.fullmatch(r"\((\d+)\)", str(value).strip())
+    return int(match.group(1)) if match else None
+
+
+def build_text_chunk(chunk_template, restaurant, dish):
+    """The text embedded for one dish row: the dish merged over its restaurant row."""
+    return chunk_template.format(**restaurant, **dish)
+
+
+class NormalizedCorpus:
+    """Sequence of per-vector entries backed by the normalized tables."""
+
+    def __init__(self, data):
+        self.chunk_template = data["chunk_template"]
+        self.restaurants = data["restaurants"]
+        self.dishes = data["dishes"]
+        self.vectors = data["vectors"]
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __getitem__(self, i):
+        # Dishes sharing a vector have byte-identical text; the first one stands in for all.
+        return self.dish_entry(self.vectors[i][0])
+
+    def dish_entry(self, dish_id):
+        dish = self.dishes[dish_id]
+        restaurant = self.restaurants[dish["restaurant"]]
+        row = {**restaurant, **dish}
+        metadata = {key: value for key, value in row.items() if key not in ("restaurant", "description")}
+        return {"metadata": metadata, "text_chunk": build_text_chunk(self.chunk_template, restaurant, dish)}
+
+    @property
+    def num_dishes(self):
+        """Dish rows, counting those that share a vector with an identical one."""
+        return len(self.dishes)
+
+
+def load_metadata_corpus(path):
+    """Loads metadata in either the normalized format or the legacy flat list."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+    return NormalizedCorpus(data)
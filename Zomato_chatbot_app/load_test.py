@@ -0,0 +1,245 @@
+"""
+load_test.py
+------------
+Concurrent-session load generator for `get_rag_response`.
+
+- Replaces the Gemini embedding / LLM calls with stand-ins whose latency follows a
+  configurable distribution (and optional error rate); FAISS search, coalescing,
+  deadlines and circuit breakers run for real.
+- Simulates N chat sessions, each sending a realistic query mix (popular questions
+  repeat, Zipf-distributed) with think time between turns.
+- Ramps concurrency step by step and reports throughput, error / degraded rates
+  and p50/p95/p99 latency per stage.
+
+Usage:
+    python load_test.py --concurrency 1,4,16,64 --step-seconds 20 \\
+        --embed-latency lognormal:120,0.4 --llm-latency lognormal:2500,0.5
+
+Latency specs (milliseconds): const:MS, uniform:LO,HI, exp:MEAN, lognormal:MEDIAN,SIGMA
+"""
+
+import os
+import json
+import math
+import time
+import zlib
+import random
+import argparse
+import threading
+import numpy as np
+import faiss
+import updated_rag_engine
+from updated_rag_engine import GeminiRagEngine, ResourceSnapshot, get_rag_response
+from corpus import NormalizedCorpus
+from reranker import DishFeatures
+
+STAGES = ["total", "wait_ready", "retrieve", "embed", "rerank", "generate"]
+
+QUERY_TEMPLATES = [
+    "Which restaurants serve {dish}?",
+    "Where can I get good {dish} in {city}?",
+    "Suggest a {cuisine} place with great ratings",
+    "Is {dish} at {restaurant} worth ordering?",
+    "What's a cheap {dish_type} option at {restaurant}?",
+    "Recommend something spicy like {dish}",
+]
+
+
+# -------------------------------
+# Latency Distributions
+# -------------------------------
+def parse_latency(spec):
+    """Turns 'lognormal:300,0.5' into a zero-argument sampler returning seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "const":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "exp":
+        return lambda: random.expovariate(1000 / values[0])
+    if kind == "lognormal":
+        mu = math.log(values[0] / 1000)
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# -------------------------------
+# Engine With Simulated Backends
+# -------------------------------
+class SimulatedEngine(GeminiRagEngine):
+    """GeminiRagEngine whose Gemini calls are replaced by latency/error stand-ins."""
+
+    def __init__(self, corpus_path, embed_latency, llm_latency, embed_error_rate=0.0, llm_error_rate=0.0,
+                 dim=768, **kwargs):
+        super().__init__(**kwargs)
+        self.corpus_path = corpus_path
+        self.embed_latency = embed_latency
+        self.llm_latency = llm_latency
+        self.embed_error_rate = embed_error_rate
+        self.llm_error_rate = llm_error_rate
+        self.dim = dim
+
+    def _configure_api(self):
+        pass
+
+    def _resource_signature(self):
+        return ("simulated",)  # never changes, so the file watcher never reloads
+
+    def _load_resources(self):
+        with open(self.corpus_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data["vectors"] = [[dish_id] for dish_id in range(len(data["dishes"]))]
+        metadata_corpus = NormalizedCorpus(data)
+
+        vectors = np.random.default_rng(0).standard_normal((len(metadata_corpus), self.dim)).astype('float32')
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(self.dim)
+        index.add(vectors)
+        self._snapshot = ResourceSnapshot(index, metadata_corpus, DishFeatures.from_corpus(metadata_corpus),
+                                          self._resource_signature(), time.time())
+
+    def _embed_query(self, query):
+        time.sleep(self.embed_latency())
+        if random.random() < self.embed_error_rate:
+            raise RuntimeError("Simulated embedding failure")
+        rng = np.random.default_rng(zlib.crc32(query.encode('utf-8')))
+        embedding = rng.standard_normal((1, self.dim)).astype('float32')
+        faiss.normalize_L2(embedding)
+        return embedding
+
+    def _generate(self, prompt):
+        time.sleep(self.llm_latency())
+        if random.random() < self.llm_error_rate:
+            raise RuntimeError("Simulated LLM failure")
+        return "Simulated answer."
+
+
+# -------------------------------
+# Query Mix
+# -------------------------------
+def build_query_pool(corpus, size, seed=0):
+    rng = random.Random(seed)
+    pool = []
+    while len(pool) < size:
+        entry = corpus.dish_entry(rng.randrange(len(corpus.dishes)))["metadata"]
+        fields = dict(entry, dish=entry["dish_name"], restaurant=entry["restaurant_name"],
+                      cuisine=entry["cuisine"].split(",")[0].strip(), dish_type=str(entry["dish_type"]).lower())
+        pool.append(rng.choice(QUERY_TEMPLATES).format(**fields))
+    return pool
+
+
+def zipf_weights(n, s):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+# -------------------------------
+# Load Runner
+# -------------------------------
+def run_step(concurrency, duration, pool, weights, think_time):
+    """Runs `concurrency` sessions for `duration` seconds; returns a list of per-turn traces."""
+    results = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def session(seed):
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            query = rng.choices(pool, weights)[0]
+            trace = {}
+            try:
+                get_rag_response(query, trace=trace, record=False)
+            except Exception:
+                trace["outcome"] = "exception"
+            with lock:
+                results.append(trace)
+            time.sleep(think_time())
+
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(concurrency)]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.monotonic() - start
+
+
+def summarize(concurrency, results, elapsed):
+    outcomes = {}
+    for trace in results:
+        outcome = trace.get("outcome", "unknown")
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    n = len(results) or 1
+    summary = {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "throughput_rps": len(results) / elapsed,
+        "error_rate": sum(v for k, v in outcomes.items() if k not in ("answered", "cached", "degraded")) / n,
+        "degraded_rate": outcomes.get("degraded", 0) / n,
+        "outcomes": outcomes,
+        "latency_ms": {},
+    }
+    for stage in STAGES:
+        samples = [trace["stages"][stage] * 1000 for trace in results if stage in trace.get("stages", {})]
+        if samples:
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+            summary["latency_ms"][stage] = {"p50": p50, "p95": p95, "p99": p99}
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n== concurrency {summary['concurrency']}: {summary['requests']} turns, "
+          f"{summary['throughput_rps']:.1f} turns/s, errors {summary['error_rate']:.1%}, "
+          f"degraded {summary['degraded_rate']:.1%}")
+    print(f"   {'stage':<11}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, p in summary["latency_ms"].items():
+        print(f"   {stage:<11}{p['p50']:>10.1f}{p['p95']:>10.1f}{p['p99']:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ramp concurrent chat sessions against get_rag_response.")
+    parser.add_argument("--corpus", default="../Structured_Data/optimized_corpus.json")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated session counts to ramp through.")
+    parser.add_argument("--step-seconds", type=float, default=15.0)
+    parser.add_argument("--embed-latency", default="lognormal:120,0.4")
+    parser.add_argument("--llm-latency", default="lognormal:2500,0.5")
+    parser.add_argument("--embed-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--think-time", default="exp:2000", help="Pause between a session's turns.")
+    parser.add_argument("--distinct-queries", type=int, default=300)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Skew of query popularity (0 = uniform).")
+    parser.add_argument("--answer-cache", type=int, default=0,
+                        help="Answer cache size; 0 (default) sends every turn through retrieval and the LLM.")
+    parser.add_argument("--embedding-cache", type=int, default=0,
+                        help="Embedding cache size; 0 (default) embeds every turn, exercising embed latency and hedging.")
+    parser.add_argument("--json", help="Also write the per-step summaries to this file.")
+    args = parser.parse_args()
+
+    engine = SimulatedEngine(
+        args.corpus,
+        embed_latency=parse_latency(args.embed_latency),
+        llm_latency=parse_latency(args.llm_latency),
+        embed_error_rate=args.embed_error_rate,
+        llm_error_rate=args.llm_error_rate,
+        answer_cache_size=args.answer_cache,
+        embedding_cache_size=args.embedding_cache,
+    )
+    updated_rag_engine.rag_engine_instance = engine
+    engine.start().wait_until_ready()
+
+    pool = build_query_pool(engine.metadata_corpus, args.distinct_queries)
+    weights = zipf_weights(len(pool), args.zipf)
+    think_time = parse_latency(args.think_time)
+
+    summaries = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        results, elapsed = run_step(concurrency, args.step_seconds, pool, weights, think_time)
+        summary = summarize(concurrency, results, elapsed)
+        print_summary(summary)
+        summaries.append(summary)
+
+    print(f"\nEngine health: {engine.health()}")
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=4)
@@ -0,0 +1,111 @@
+"""
+manual_context.py
+-----------------
+Structured lookups for the chat commands, answered straight from
+`knowledge_base.json` without retrieval or the LLM:
+
+- `restaurant-list`              — every restaurant with cuisine, city and rating
+- `menu-list <restaurant>`       — dishes and prices of one restaurant
+- `serves-dish-item <dish>`      — which restaurants serve a dish
+
+Names are matched case-insensitively; misspelled names fall back to the closest
+autocomplete suggestion, so "menu-list bikanerwala" still finds Bikanervala.
+"""
+
+import json
+from collections import namedtuple
+from functools import lru_cache
+from autocomplete import NameAutocompleter, _normalize
+
+KNOWLEDGE_BASE_PATH = "../Structured_Data/knowledge_base.json"
+COMMANDS = ("restaurant-list", "menu-list", "serves-dish-item")
+MENU_LIMIT = 40
+SERVES_LIMIT = 20
+
+# `menus` maps a normalized restaurant name to its entry, `servings` a normalized
+# dish name to the (dish, restaurant) pairs serving it.
+KnowledgeBase = namedtuple("KnowledgeBase", ["restaurants", "menus", "servings", "autocompleter"])
+
+
+@lru_cache(maxsize=1)
+def load_knowledge_base(path=KNOWLEDGE_BASE_PATH):
+    """Loads and indexes the knowledge base once per process."""
+    with open(path, 'r', encoding='utf-8') as f:
+        restaurants = json.load(f)
+    menus, servings = {}, {}
+    for restaurant in restaurants:
+        menus[_normalize(restaurant["restaurant_name"])] = restaurant
+        seen = set()
+        for dish in restaurant.get("restaurant_menu") or []:
+            key = _normalize(dish.get("dish_name") or "")
+            if key and key not in seen:  # menus list some dishes twice
+                seen.add(key)
+                servings.setdefault(key, []).append((dish, restaurant))
+    return KnowledgeBase(restaurants, menus, servings, NameAutocompleter.from_knowledge_base(path))
+
+
+def _resolve(name, index, kind, autocompleter):
+    """Normalized key of `name` in `index`, falling back to the closest suggestion of `kind`."""
+    key = _normalize(name)
+    if key in index:
+        return key
+    suggestions = autocompleter.suggest(name, limit=1, kind=kind)
+    return _normalize(suggestions[0].name) if suggestions else None
+
+
+def restaurant_list(restaurants):
+    lines = [f"I know about these {len(restaurants)} restaurants:", ""]
+    for restaurant in restaurants:
+        lines.append(
+            f"- **{restaurant['restaurant_name']}** — {restaurant['available_cuisine']} "
+            f"({restaurant['city']}), rated {str(restaurant['restaurant_rating']).strip()}"
+        )
+    return "\n".join(lines)
+
+
+def menu_list(name, kb):
+    key = _resolve(name, kb.menus, "restaurant", kb.autocompleter)
+    if key is None:
+        return f"I couldn't find a restaurant called \"{name}\". Try `restaurant-list` to see them all."
+
+    restaurant = kb.menus[key]
+    menu = restaurant.get("restaurant_menu") or []
+    lines = [f"**{restaurant['restaurant_name']}** ({restaurant['city']}) has {len(menu)} dishes on the menu:", ""]
+    for dish in menu[:MENU_LIMIT]:
+        lines.append(f"- {dish['dish_name']} — ₹{dish['price']}")
+    if len(menu) > MENU_LIMIT:
+        lines.append(f"\n…and {len(menu) - MENU_LIMIT} more.")
+    return "\n".join(lines)
+
+
+def serves_dish_item(name, kb):
+    key = _resolve(name, kb.servings, "dish", kb.autocompleter)
+    if key is None:
+        return f"I couldn't find a dish called \"{name}\"."
+
+    pairs = kb.servings[key]
+    lines = [f"**{pairs[0][0]['dish_name']}** is served at:", ""]
+    for dish, restaurant in pairs[:SERVES_LIMIT]:
+        lines.append(f"- {restaurant['restaurant_name']} ({restaurant['city']}) — ₹{dish['price']}")
+    if len(pairs) > SERVES_LIMIT:
+        lines.append(f"\n…and {len(pairs) - SERVES_LIMIT} more.")
+    return "\n".join(lines)
+
+
+def custom_context(user_input):
+    """Answers a structured command; `user_input` contains one of COMMANDS."""
+    kb = load_knowledge_base()
+    lowered = user_input.lower()
+    for command in COMMANDS:
+        position = lowered.find(command)
+        if position == -1:
+            continue
+        name = user_input[position + len(command):].strip()
+        if command == "restaurant-list":
+            return restaurant_list(kb.restaurants)
+        if not name:
+            return f"Please add a name after `{command}`, e.g. `{command} {'Bikanervala' if command == 'menu-list' else 'Butter Paneer'}`."
+        if command == "menu-list":
+            return menu_list(name, kb)
+        return serves_dish_item(name, kb)
+    return "Unknown command. Try `restaurant-list`, `menu-list <restaurant>` or `serves-dish-item <dish>`."
@@ -0,0 +1,213 @@
+"""
+profiling.py
+------------
+On-demand CPU / memory profiling of individual chat turns and resource loads.
+
+- A turn is captured when requested explicitly (`get_rag_response(..., profile=True)`)
+  or by sampling (`RAG_PROFILE_SAMPLE_RATE=0.01` profiles ~1% of turns);
+  `RAG_PROFILE_LOAD=1` also captures `_load_resources`.
+- Each capture writes a directory with `cpu.prof` (cProfile), `alloc.snapshot`
+  (tracemalloc: blocks allocated during the turn and still alive at its end) and
+  `meta.json` (query, stage timings, wall time, peak traced memory).
+- Captures go to `RAG_PROFILE_DIR` (default `../profiles`); only the newest
+  `RAG_PROFILE_KEEP` (default 100) are kept.
+
+Only one capture runs at a time (tracemalloc is process-wide); turns arriving
+while another is being profiled simply run unprofiled. cProfile sees the calling
+thread only, so time spent waiting on Gemini calls shows up as waits, not as the
+SDK's own frames.
+
+tracemalloc cannot tell threads apart: a turn's `alloc.snapshot` also holds
+blocks allocated by other threads during the capture (the loader, concurrent
+turns). `meta.json` records how many threads were alive; `report --code-path`
+keeps only allocations with a matching file anywhere in their traceback.
+
+Report across captures:
+    python profiling.py report ../profiles --top 25
+    python profiling.py report ../profiles --code-path '*updated_rag_engine.py'
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import shutil
+import pstats
+import argparse
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+
+class TurnProfiler:
+    def __init__(self, directory="../profiles", sample_rate=0.0, keep=100, profile_load=False, frames=10):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.profile_load = profile_load
+        self.frames = frames
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Reads the RAG_PROFILE_* variables. The engine builds its profiler at import
+        time, so an invalid value disables profiling with a warning instead of raising.
+        """
+        try:
+            sample_rate = float(os.getenv("RAG_PROFILE_SAMPLE_RATE", "0"))
+            keep = int(os.getenv("RAG_PROFILE_KEEP", "100"))
+            if not 0 <= sample_rate <= 1:
+                raise ValueError(f"sample rate {sample_rate} is outside [0, 1]")
+            if keep < 1:
+                raise ValueError(f"keep {keep} must be at least 1")
+        except ValueError as e:
+            print(f"Invalid RAG_PROFILE_* setting ({e}); profiling disabled.")
+            return cls()
+        return cls(
+            directory=os.getenv("RAG_PROFILE_DIR", "../profiles"),
+            sample_rate=sample_rate,
+            keep=keep,
+            profile_load=os.getenv("RAG_PROFILE_LOAD") == "1",
+        )
+
+    def should_profile(self, requested=False):
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    @contextmanager
+    def capture(self, label, meta):
+        """
+        Profiles the enclosed block. `meta` is written to meta.json when the block
+        exits, so the caller may keep filling it (e.g. with stage timings) inside.
+        """
+        if not self._lock.acquire(blocking=False):
+            yield False
+            return
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(self.frames)
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        meta["threads"] = threading.active_count()
+        start = time.perf_counter()
+        try:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger) is already active on this thread.
+                profiler = None
+            yield True
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            try:
+                self._write(label, meta, profiler, snapshot, wall, peak)
+            except Exception as e:
+                print(f"Could not write profile capture: {e}")
+            finally:
+                self._lock.release()
+
+    def _write(self, label, meta, profiler, snapshot, wall, peak):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:6]}"
+        path = os.path.join(self.directory, name)
+        os.makedirs(path)
+        if profiler is not None:
+            profiler.dump_stats(os.path.join(path, "cpu.prof"))
+        snapshot.dump(os.path.join(path, "alloc.snapshot"))
+        with open(os.path.join(path, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, label=label, wall_seconds=wall, peak_traced_bytes=peak), f, indent=4, default=str)
+        print(f"Profile captured: {path}")
+        self._rotate()
+
+    def _rotate(self):
+        captures = sorted(d for d in os.listdir(self.directory) if os.path.isdir(os.path.join(self.directory, d)))
+        for old in captures[:-self.keep] if self.keep else []:
+            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+
+
+# -------------------------------
+# Report Tool
+# -------------------------------
+def _captures(directory):
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(os.path.join(path, "meta.json")):
+            yield path
+
+
+def report(directory, top=25, label=None, code_path=None):
+    """
+    Aggregates hottest functions and largest allocation sites across captures.
+    `code_path` (a filename glob) keeps only allocations made with a matching
+    file on the stack, which excludes other threads' unrelated work.
+    """
+    metas, prof_files, allocations = [], [], {}
+    for path in _captures(directory):
+        with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if label and meta.get("label") != label:
+            continue
+        metas.append(meta)
+        if os.path.exists(os.path.join(path, "cpu.prof")):
+            prof_files.append(os.path.join(path, "cpu.prof"))
+        snapshot = tracemalloc.Snapshot.load(os.path.join(path, "alloc.snapshot"))
+        if code_path:
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(True, code_path, all_frames=True)])
+        for stat in snapshot.statistics("lineno"):
+            frame = stat.traceback[0]
+            key = f"{frame.filename}:{frame.lineno}"
+            size, count = allocations.get(key, (0, 0))
+            allocations[key] = (size + stat.size, count + stat.count)
+
+    if not metas:
+        print(f"No captures found in {directory}.")
+        return
+
+    print(f"== {len(metas)} captures in {directory}")
+    stage_totals = {}
+    for meta in metas:
+        for stage, seconds in meta.get("trace", {}).get("stages", {}).items():
+            stage_totals.setdefault(stage, []).append(seconds * 1000)
+    for stage, samples in stage_totals.items():
+        samples.sort()
+        print(f"   {stage:<11} median {samples[len(samples) // 2]:8.1f} ms   max {samples[-1]:8.1f} ms")
+
+    print("\n== Slowest captures")
+    for meta in sorted(metas, key=lambda m: -m["wall_seconds"])[:5]:
+        print(f"   {meta['wall_seconds'] * 1000:8.1f} ms  peak {meta['peak_traced_bytes'] / 1024:8.0f} KiB  "
+              f"{meta.get('label')}: {meta.get('query', '')[:60]}")
+
+    if prof_files:
+        print(f"\n== Hottest functions (own time, {len(prof_files)} profiles)")
+        stats = pstats.Stats(*prof_files)
+        stats.strip_dirs().sort_stats("tottime").print_stats(top)
+
+    if code_path:
+        print(f"== Largest allocation sites still alive at end of capture (traceback through {code_path})")
+    else:
+        max_threads = max(meta.get("threads", 1) for meta in metas)
+        print("== Largest allocation sites still alive at end of capture")
+        print(f"   (process-wide: includes other threads' allocations, up to {max_threads} threads alive; "
+              f"use --code-path to narrow)")
+    for key, (size, count) in sorted(allocations.items(), key=lambda item: -item[1][0])[:top]:
+        print(f"   {size / 1024:10.1f} KiB  {count:8d} blocks  {key}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect profiles captured by the RAG engine.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report_parser = sub.add_parser("report", help="Aggregate hottest functions and allocation sites.")
+    report_parser.add_argument("directory", nargs="?", default=os.getenv("RAG_PROFILE_DIR", "../profiles"))
+    report_parser.add_argument("--top", type=int, default=25)
+    report_parser.add_argument("--label", help="Only include captures with this label (turn, load_resources).")
+    report_parser.add_argument("--code-path", help="Only count allocations with a file matching this glob on the stack.")
+    args = parser.parse_args()
+
+    report(args.directory, args.top, args.label, args.code_path)
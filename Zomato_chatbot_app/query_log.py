@@ -0,0 +1,119 @@
+"""
+query_log.py
+------------
+Compact, persistent frequency log of the questions users ask.
+
+The engine records every retrieval query (normalized) here. The counts are
+flushed to a small JSON file from the engine's background thread, never on the
+request path, and only the most frequent `max_entries` queries are kept. After a
+restart the engine replays the top of this log to warm its caches.
+
+Several worker processes may share one log file: each flush re-reads the file
+under a lock and adds only this process's new counts, so no worker overwrites
+another's. One process at a time holds the warm-up claim (`claim_warmup`), so
+replaying answers through the LLM does not scale with the number of workers.
+File locks need `fcntl` (POSIX); elsewhere flushes are merged without a lock and
+every process may warm up.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class QueryLog:
+    def __init__(self, path, max_entries=5000, flush_interval=30.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._counts = Counter()   # merged view: file contents + this process's pending counts
+        self._pending = Counter()  # recorded here since the last flush
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+        self._warmup_lock = None
+        self._counts.update(self._read())
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return Counter(json.load(f))
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, TypeError, ValueError) as e:
+            print(f"Ignoring unreadable query log {self.path}: {e}")
+        return Counter()
+
+    def record(self, normalized_query):
+        with self._lock:
+            self._counts[normalized_query] += 1
+            self._pending[normalized_query] += 1
+
+    def top(self, n):
+        """The `n` most frequent queries, most frequent first."""
+        with self._lock:
+            return [query for query, _ in self._counts.most_common(n)]
+
+    def maybe_flush(self):
+        if self._pending and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Adds this process's new counts to the file (re-read under a lock), keeps the
+        top `max_entries` and writes atomically (temp file + rename). No-op when
+        nothing was recorded since the last flush.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with self._file_lock(self.path + ".lock"):
+                counts = self._read()
+                counts.update(pending)
+                counts = Counter(dict(counts.most_common(self.max_entries)))
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(counts), f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+        except OSError:
+            with self._lock:
+                self._pending.update(pending)  # keep them for the next flush
+            raise
+        with self._lock:
+            # Other workers' counts plus anything recorded here during the write.
+            self._counts = counts + self._pending
+
+    def claim_warmup(self):
+        """
+        True if this process may replay the log to warm up. The claim is held until
+        the process exits, so at most one live worker sharing the file warms up.
+        """
+        if fcntl is None:
+            return True
+        if self._warmup_lock is None:
+            lock_file = open(self.path + ".warmup.lock", 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._warmup_lock = lock_file
+        return True
+
+    @staticmethod
+    def _file_lock(lock_path):
+        lock_file = open(lock_path, 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file  # closing the file releases the lock
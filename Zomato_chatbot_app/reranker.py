@@ -0,0 +1,161 @@
+"""
+reranker.py
+-----------
+Second-stage re-ranking of FAISS candidates.
+
+FAISS ranks by embedding similarity alone. The engine over-fetches a candidate
+pool (default 100 vectors) and this module re-scores it in one NumPy pass with a
+weighted sum of:
+
+- similarity         — cosine score, min-max scaled within the pool
+- rating             — dish rating / 5
+- reviews            — log1p(num_reviews), scaled by the corpus maximum
+- restaurant_rating  — restaurant rating / 5
+- price_fit          — how well the price matches a budget stated in the query
+                       ("under 300", "cheap"); ignored when the query has none
+
+Per-vector features are extracted once per loaded snapshot (`DishFeatures`), so
+re-ranking costs a few array operations per turn. Scraped values are messy
+(missing ratings, prices leaked into the rating column); anything unparsable
+falls back to the corpus average, so it neither helps nor hurts a dish.
+
+Weights come from `RAG_RERANK_WEIGHTS`, e.g. "similarity=1,rating=0.3,price_fit=0".
+"""
+
+import os
+import re
+import numpy as np
+
+FEATURES = ("similarity", "rating", "reviews", "restaurant_rating", "price_fit")
+
+DEFAULT_WEIGHTS = {
+    "similarity": 1.0,
+    "rating": 0.2,
+    "reviews": 0.1,
+    "restaurant_rating": 0.05,
+    "price_fit": 0.25,
+}
+
+BUDGET_PATTERN = re.compile(r"\b(?:under|below|less than|within|upto|up to|max(?:imum)?|around)\s*(?:rs\.?|inr|₹)?\s*(\d{2,5})\b")
+CHEAP_WORDS = {"cheap", "cheapest", "budget", "affordable", "inexpensive", "pocket-friendly", "economical"}
+
+
+def _to_float(value, low, high):
+    """Parses a scraped number; values that don't parse or fall outside [low, high] become NaN."""
+    try:
+        number = float(str(value).strip())
+    except (TypeError, ValueError):
+        return np.nan
+    return number if low <= number <= high else np.nan
+
+
+def _fill(values):
+    """Replaces NaNs with the mean of the known values (0.5 if none are known)."""
+    known = values[~np.isnan(values)]
+    return np.where(np.isnan(values), known.mean() if known.size else 0.5, values)
+
+
+class DishFeatures:
+    """Per-vector feature columns, aligned with the FAISS vector ids."""
+
+    def __init__(self, rating, reviews, restaurant_rating, price):
+        self.rating = rating
+        self.reviews = reviews
+        self.restaurant_rating = restaurant_rating
+        self.price = price
+
+    @classmethod
+    def from_corpus(cls, metadata_corpus):
+        metas = [metadata_corpus[i]['metadata'] for i in range(len(metadata_corpus))]
+        rating = np.array([_to_float(m.get('rating'), 0, 5) for m in metas], dtype='float32')
+        restaurant_rating = np.array([_to_float(m.get('restaurant_rating'), 0, 5) for m in metas], dtype='float32')
+        reviews = np.log1p(np.array([_to_float(m.get('num_reviews'), 0, np.inf) for m in metas], dtype='float32'))
+        price = np.array([_to_float(m.get('price'), 0, 100000) for m in metas], dtype='float32')
+
+        reviews = np.nan_to_num(reviews, nan=0.0)
+        max_reviews = reviews.max() if reviews.size else 0.0
+        return cls(
+            rating=_fill(rating / 5),
+            reviews=reviews / max_reviews if max_reviews > 0 else reviews,
+            restaurant_rating=_fill(restaurant_rating / 5),
+            price=price,
+        )
+
+
+def parse_budget(query):
+    """
+    Returns (max_price, wants_cheap) stated in the query: "under 250" -> (250, False),
+    "something cheap" -> (None, True), no price preference -> (None, False).
+    """
+    text = query.lower()
+    match = BUDGET_PATTERN.search(text)
+    max_price = float(match.group(1)) if match else None
+    return max_price, bool(CHEAP_WORDS.intersection(re.findall(r"[\w-]+", text)))
+
+
+class Reranker:
+    def __init__(self, weights=None):
+        unknown = set(weights or {}) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown re-ranking features: {', '.join(sorted(unknown))}")
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    @classmethod
+    def from_env(cls):
+        """
+        Reads RAG_RERANK_WEIGHTS. The engine is built at import time, so a malformed
+        value is reported and the default weights are used instead of raising.
+        """
+        spec = os.getenv("RAG_RERANK_WEIGHTS", "")
+        weights = {}
+        try:
+            for item in filter(None, (part.strip() for part in spec.split(","))):
+                name, _, value = item.partition("=")
+                weights[name.strip()] = float(value)
+            return cls(weights)
+        except ValueError as e:
+            print(f"Ignoring RAG_RERANK_WEIGHTS={spec!r} ({e}); using the default weights.")
+            return cls()
+
+    def price_fit(self, query, price):
+        """Score in [0, 1] per candidate, or None when the query states no budget."""
+        max_price, wants_cheap = parse_budget(query)
+        if max_price is not None:
+            # Full score within budget, falling linearly to 0 at twice the budget.
+            fit = np.clip(2 - price / max_price, 0, 1)
+        elif wants_cheap:
+            # Cheapest candidate in the pool scores 1, the most expensive 0.
+            fit = 1 - self._scale(price)
+        else:
+            return None
+        return np.where(np.isnan(price), 0.5, fit)
+
+    @staticmethod
+    def _scale(values):
+        known = values[~np.isnan(values)]
+        if not known.size or known.max() == known.min():
+            return np.full_like(values, 0.5)
+        return (values - known.min()) / (known.max() - known.min())
+
+    def rank(self, query, scores, ids, features, k):
+        """
+        Re-ranks FAISS results (`scores`, `ids`: 1-D arrays, -1 ids ignored) and
+        returns the ids of the best `k` candidates, best first.
+        """
+        valid = ids != -1
+        scores, ids = scores[valid], ids[valid]
+        if ids.size <= 1:
+            return ids[:k]
+
+        w = self.weights
+        combined = w["similarity"] * self._scale(scores)
+        combined += w["rating"] * features.rating[ids]
+        combined += w["reviews"] * features.reviews[ids]
+        combined += w["restaurant_rating"] * features.restaurant_rating[ids]
+        fit = self.price_fit(query, features.price[ids]) if w["price_fit"] else None
+        if fit is not None:
+            combined += w["price_fit"] * fit
+
+        # Stable sort keeps FAISS order among ties.
+        order = np.argsort(-combined, kind="stable")[:k]
+        return ids[order]
@@ -0,0 +1,186 @@
+"""
+resilience.py
+-------------
+Latency and failure guards for calls to the Gemini backend.
+
+- `call_with_deadline`: gives up on a call after a fixed time budget.
+- `hedged_call`: fires a backup request if the first one is slow, takes whichever returns first.
+- `CircuitBreaker`: fails fast while the backend is unhealthy instead of queueing more calls.
+- `RateLimiter`: token bucket that paces bulk callers (batch runs, cache warm-up).
+
+Calls run on a caller-provided ThreadPoolExecutor (one per backend stage, so a
+slow stage cannot starve the others). A call's deadline starts when it begins
+running; time spent waiting for a free worker is bounded separately by
+`queue_timeout`. A call that misses its deadline keeps running on its worker
+thread (Python threads cannot be killed), but the user's turn no longer waits for it.
+"""
+
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a guarded call does not finish within its time budget."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+def _name(fn):
+    return getattr(fn, '__name__', 'call')
+
+
+def _submit_and_wait_start(executor, queue_timeout, fn, args, kwargs):
+    """
+    Submits `fn` and waits until a worker picks it up. Returns (future, start
+    time). Raises DeadlineExceeded if it is still queued after `queue_timeout`.
+    """
+    started = threading.Event()
+    start = []
+
+    def run():
+        start.append(time.monotonic())
+        started.set()
+        return fn(*args, **kwargs)
+
+    future = executor.submit(run)
+    if not started.wait(queue_timeout) and future.cancel():
+        raise DeadlineExceeded(f"{_name(fn)} waited over {queue_timeout:.1f}s for a free worker")
+    started.wait()  # cancel() failed, so the call is already running
+    return future, start[0]
+
+
+def call_with_deadline(executor, timeout, fn, *args, queue_timeout=None, **kwargs):
+    """
+    Runs `fn` on `executor` and waits at most `timeout` seconds for it once it
+    starts running. Queueing for a worker may take up to `queue_timeout`
+    (default: `timeout`).
+    """
+    queue_timeout = timeout if queue_timeout is None else queue_timeout
+    future, start = _submit_and_wait_start(executor, queue_timeout, fn, args, kwargs)
+    done, _ = wait([future], timeout=max(0.0, start + timeout - time.monotonic()))
+    if not done:
+        raise DeadlineExceeded(f"{_name(fn)} exceeded {timeout:.1f}s deadline")
+    return future.result()
+
+
+def hedged_call(executor, timeout, hedge_after, fn, *args, queue_timeout=None, **kwargs):
+    """
+    Like `call_with_deadline`, but if the first attempt has not returned
+    `hedge_after` seconds after it started, a second identical attempt is
+    submitted. The first successful result wins. `hedge_after=None` disables hedging.
+    """
+    if hedge_after is None or hedge_after >= timeout:
+        return call_with_deadline(executor, timeout, fn, *args, queue_timeout=queue_timeout, **kwargs)
+
+    queue_timeout = timeout if queue_timeout is None else queue_timeout
+    first, start = _submit_and_wait_start(executor, queue_timeout, fn, args, kwargs)
+    deadline = start + timeout
+    done, pending = wait({first}, timeout=max(0.0, start + hedge_after - time.monotonic()))
+    if not done:
+        pending.add(executor.submit(fn, *args, **kwargs))
+
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+        if not pending:
+            raise error
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    for future in pending:
+        future.cancel()
+    raise DeadlineExceeded(f"{_name(fn)} exceeded {timeout:.1f}s deadline")
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and every
+    call fails immediately with CircuitOpenError. After `reset_timeout` seconds
+    one trial call is let through; success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self):
+        return self._state
+
+    def _acquire(self):
+        with self._lock:
+            if self._state == "closed":
+                return
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"  # this caller is the trial
+                return
+            raise CircuitOpenError(f"{self.name} circuit is open; failing fast.")
+
+    def _on_success(self):
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+
+    def _on_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    print(f"Circuit breaker '{self.name}' opened after {self._failures} failures.")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        self._acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+
+class RateLimiter:
+    """Token bucket: on average `rate` acquisitions per second, bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        if burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            time.sleep(wait_for)
@@ -0,0 +1,179 @@
+"""
+shared_index.py
+---------------
+Shares one copy of the FAISS vectors and metadata across worker processes.
+
+A single loader process publishes the index as read-only files:
+- `vectors.npy`       — normalized float32 matrix, memory-mapped by readers
+- `meta_blob.bin`     — compact JSON records for every vector, back to back
+- `meta_offsets.npy`  — int64 byte offsets into the blob (n + 1 entries)
+
+Each publish goes into a fresh `gen-<N>` directory. The `CURRENT` manifest is
+replaced atomically only after the generation is fully on disk, so readers
+never see a half-written index. Readers map the files with `mmap`, so every
+process shares the same page-cache pages (zero-copy).
+
+Usage (loader process):
+    python shared_index.py --shared-dir /dev/shm/zomato_rag --watch
+
+Worker processes then set `RAG_SHARED_INDEX_DIR=/dev/shm/zomato_rag`.
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+import faiss
+from corpus import load_metadata_corpus
+
+MANIFEST_NAME = "CURRENT"
+
+
+# -------------------------------
+# Reader side (zero-copy attach)
+# -------------------------------
+class SharedFlatIndex:
+    """Inner-product search over a memory-mapped vector matrix (FAISS-compatible `search`)."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.ntotal, self.d = vectors.shape
+
+    def search(self, queries, k):
+        scores = np.asarray(queries, dtype='float32') @ self.vectors.T
+        k = min(k, self.ntotal)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+class MappedMetadata:
+    """Read-only sequence of metadata dicts decoded lazily from a memory-mapped blob."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = self._offsets[i], self._offsets[i + 1]
+        return json.loads(self._blob[start:end].tobytes())
+
+
+def manifest_path(shared_dir):
+    return os.path.join(shared_dir, MANIFEST_NAME)
+
+
+def read_manifest(shared_dir):
+    with open(manifest_path(shared_dir), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def attach_shared_index(shared_dir):
+    """Maps the current generation. Returns (index, metadata, generation)."""
+    manifest = read_manifest(shared_dir)
+    gen_dir = os.path.join(shared_dir, manifest["path"])
+    vectors = np.load(os.path.join(gen_dir, "vectors.npy"), mmap_mode='r')
+    offsets = np.load(os.path.join(gen_dir, "meta_offsets.npy"), mmap_mode='r')
+    blob = np.memmap(os.path.join(gen_dir, "meta_blob.bin"), dtype=np.uint8, mode='r')
+    if vectors.shape[0] != len(offsets) - 1:
+        raise ValueError(f"Generation {manifest['generation']} is inconsistent.")
+    return SharedFlatIndex(vectors), MappedMetadata(blob, offsets), manifest["generation"]
+
+
+# -------------------------------
+# Loader side (publish)
+# -------------------------------
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_file(path, write):
+    with open(path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def publish_shared_index(index_path, metadata_path, shared_dir, keep=3):
+    """Publishes the FAISS index + metadata as a new generation and flips `CURRENT`."""
+    os.makedirs(shared_dir, exist_ok=True)
+    try:
+        generation = read_manifest(shared_dir)["generation"] + 1
+    except FileNotFoundError:
+        generation = 1
+
+    index = faiss.read_index(index_path)
+    vectors = index.reconstruct_n(0, index.ntotal).astype('float32')
+    metadata_corpus = load_metadata_corpus(metadata_path)
+    if len(metadata_corpus) != index.ntotal:
+        raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(metadata_corpus)} entries.")
+
+    records = [
+        json.dumps(metadata_corpus[i], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        for i in range(len(metadata_corpus))
+    ]
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(r) for r in records])
+
+    name = f"gen-{generation}"
+    tmp_dir = os.path.join(shared_dir, name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    _write_file(os.path.join(tmp_dir, "vectors.npy"), lambda f: np.save(f, vectors))
+    _write_file(os.path.join(tmp_dir, "meta_offsets.npy"), lambda f: np.save(f, offsets))
+    _write_file(os.path.join(tmp_dir, "meta_blob.bin"), lambda f: f.write(b"".join(records)))
+    shutil.rmtree(os.path.join(shared_dir, name), ignore_errors=True)  # leftover of a failed publish
+    os.rename(tmp_dir, os.path.join(shared_dir, name))
+
+    manifest = {"generation": generation, "path": name, "ntotal": int(index.ntotal), "dim": int(index.d)}
+    tmp_manifest = manifest_path(shared_dir) + ".tmp"
+    _write_file(tmp_manifest, lambda f: f.write(json.dumps(manifest).encode('utf-8')))
+    os.replace(tmp_manifest, manifest_path(shared_dir))
+    _fsync_dir(shared_dir)
+    print(f"Published generation {generation} ({index.ntotal} vectors) to {shared_dir}")
+
+    # Old generations stay mapped in readers even after unlink; keep a few for
+    # processes that read the manifest just before the flip.
+    for old in range(1, generation - keep + 1):
+        shutil.rmtree(os.path.join(shared_dir, f"gen-{old}"), ignore_errors=True)
+    return generation
+
+
+def _signature(paths):
+    return tuple((os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the FAISS index for zero-copy sharing across workers.")
+    parser.add_argument("--index", default="../faiss_index/faiss_index.bin")
+    parser.add_argument("--metadata", default="../faiss_index/metadata_corpus.json")
+    parser.add_argument("--shared-dir", required=True, help="e.g. /dev/shm/zomato_rag")
+    parser.add_argument("--watch", action="store_true", help="Republish whenever the source files change.")
+    parser.add_argument("--interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    published = _signature([args.index, args.metadata])
+    publish_shared_index(args.index, args.metadata, args.shared_dir)
+    while args.watch:
+        time.sleep(args.interval)
+        try:
+            current = _signature([args.index, args.metadata])
+            if current != published:
+                time.sleep(args.interval)  # let the indexer finish writing
+                if _signature([args.index, args.metadata]) == current:
+                    publish_shared_index(args.index, args.metadata, args.shared_dir)
+                    published = current
+        except Exception as e:
+            print(f"Publish failed, readers keep the previous generation: {e}")
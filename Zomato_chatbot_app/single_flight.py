@@ -0,0 +1,55 @@
+"""
+single_flight.py
+----------------
+In-flight request coalescing for the RAG engine.
+
+When several sessions ask the same thing at the same moment, only the first
+caller (the "leader") runs the expensive backend call. Every concurrent caller
+with the same key waits on the leader's result instead of issuing its own
+request. Once the call finishes the key is released, so later callers start a
+fresh computation.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Runs `fn(*args, **kwargs)` once per in-flight `key`; followers get the same result or exception."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self._calls)}
@@ -4,15 +4,27 @@ app.py
 Streamlit UI for the Zomato RAG Chatbot.
 
 Features:
-- Conversational memory using `st.session_state`
-- Rich HTML-styled user/bot cards
-- Async-like update with form submission and rerun
+- Conversational memory using `st.session_state`, capped per session
+- Rich HTML-styled user/bot cards, pre-rendered once per turn
+- One script run per message (answer computed under a spinner, no extra reruns)
+- Only the most recent turns are drawn; older ones are paged on demand
 - Minimalist input box with submit icon
 - Sidebar instructions for structured search keywords
+- Non-blocking engine warm-up with a readiness indicator
+- Typo-tolerant dish / restaurant autocomplete for the structured commands
+  (updates per keystroke when the optional `streamlit-keyup` package is installed,
+  otherwise on Enter)
 """
 
+import os
 import streamlit as st
-from updated_rag_engine import get_rag_response  # ⬅️ Core RAG logic
+from updated_rag_engine import get_rag_response, get_engine  # ⬅️ Core RAG logic
+from manual_context import load_knowledge_base
+
+try:
+    from st_keyup import st_keyup  # reruns on every keystroke (debounced)
+except ImportError:
+    st_keyup = None
 
 # -------------------------------
 # Streamlit Config & Header
@@ -21,6 +33,10 @@ st.set_page_config(page_title="Zomato RAG Chatbot", page_icon="🍽️")
 st.title("🍽️ Zomato RAG Chatbot")
 st.markdown("Ask anything about restaurants, menus, cuisines, or specific dishes.")
 
+# Kick off background loading; returns immediately so the page paints first.
+# The app is the one caller whose queries feed the cache warm-up log.
+engine = get_engine(query_log_path=os.getenv("RAG_QUERY_LOG", "../query_log.json"))
+
 # -------------------------------
 # Sidebar Instructions
 # -------------------------------
@@ -42,28 +58,53 @@ with st.sidebar:
 
 """)
 
+    health = engine.health()
+    if health["ready"]:
+        st.caption(f"🟢 Engine ready · {health['num_dishes']} dishes indexed")
+    elif health["state"] == "stopped":
+        st.caption("🔴 Engine stopped before it finished loading.")
+    else:
+        st.caption(f"🟡 Engine warming up (attempt {health['attempts']})…")
+        if health["last_error"]:
+            st.caption(f"Last error: {health['last_error']}")
+
 # -------------------------------
 # State Initialization
 # -------------------------------
+MAX_STORED_TURNS = 100   # per-session history cap (oldest turns are dropped)
+VISIBLE_TURNS = 10       # turns always drawn below the input
+EARLIER_PAGE_SIZE = 10   # turns per page in the "earlier messages" view
+
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
 # -------------------------------
 # HTML Styling for Chat Cards
 # -------------------------------
+# Cards are joined into one markdown element, so no line may be indented (four
+# spaces would start a code block) and each card ends with a blank line.
 def user_card(text: str) -> str:
-    return f"""
-    <div style="background-color:#f0f2f6;padding:10px;border-radius:10px;margin-bottom:10px;">
-        <b style="color:#1f77b4;">You:</b> {text}
-    </div>
-    """
+    return (
+        '<div style="background-color:#f0f2f6;padding:10px;border-radius:10px;margin-bottom:10px;">'
+        f'<b style="color:#1f77b4;">You:</b> {text}\n</div>\n\n'
+    )
 
 def bot_card(text: str) -> str:
-    return f"""
-    <div style="background-color:#d2f8d2;padding:10px;border-radius:10px;margin-bottom:15px;">
-        <b style="color:#2c7a7b;">Bot:</b> {text}
-    </div>
-    """
+    return (
+        '<div style="background-color:#d2f8d2;padding:10px;border-radius:10px;margin-bottom:15px;">'
+        f'<b style="color:#2c7a7b;">Bot:</b> {text}\n</div>\n\n'
+    )
+
+# -------------------------------
+# Finder State (suggestion clicks become chat commands)
+# -------------------------------
+if "lookup_round" not in st.session_state:
+    st.session_state.lookup_round = 0
+
+def send_command(command: str):
+    # Answered in the same script run that the click triggers.
+    st.session_state.pending_query = command
+    st.session_state.lookup_round += 1  # a fresh key empties the finder
 
 # -------------------------------
 # User Input Form (with icon)
@@ -77,27 +118,78 @@ with st.form(key="query_form", clear_on_submit=True):
     submitted = st.form_submit_button("➤ Send", use_container_width=True)
 
 # -------------------------------
-# Step 1: Handle Form Submit
+# Dish / Restaurant Finder
 # -------------------------------
-if submitted and user_input:
-    st.session_state.chat_history.append({
-        "user": user_input,
-        "bot": "⏳ Thinking..."
-    })
-    st.rerun()
+lookup_key = f"name_lookup_{st.session_state.lookup_round}"
+if st_keyup is not None:
+    lookup = st_keyup(
+        "🔎 Find a dish or restaurant",
+        placeholder="Start typing a name, e.g. bikanerwala or shahi paner",
+        key=lookup_key,
+        debounce=150
+    )
+else:
+    lookup = st.text_input(
+        label="🔎 Find a dish or restaurant (press Enter to search)",
+        placeholder="Start typing a name, e.g. bikanerwala or shahi paner",
+        key=lookup_key
+    )
+if lookup:
+    # "menu-list bik" only suggests restaurants, "serves-dish-item pan" only dishes.
+    kind = None
+    for command, command_kind in (("menu-list", "restaurant"), ("serves-dish-item", "dish")):
+        if lookup.lower().startswith(command):
+            lookup, kind = lookup[len(command):], command_kind
+    suggestions = load_knowledge_base().autocompleter.suggest(lookup, limit=6, kind=kind)
+    if suggestions:
+        columns = st.columns(2)
+        for i, suggestion in enumerate(suggestions):
+            icon = "🏪" if suggestion.kind == "restaurant" else "🍽️"
+            columns[i % 2].button(
+                f"{icon} {suggestion.name}",
+                key=f"suggestion_{i}",
+                help=suggestion.command,
+                on_click=send_command,
+                args=(suggestion.command,),
+                use_container_width=True
+            )
+    else:
+        st.caption("No close matches.")
 
 # -------------------------------
-# Step 2: Render Chat Cards
+# Step 1: Render Chat Cards
 # -------------------------------
-for message in st.session_state.chat_history:
-    st.markdown(user_card(message["user"]), unsafe_allow_html=True)
+# Each turn is stored once, as the HTML it renders to.
+query = user_input if submitted and user_input else st.session_state.pop("pending_query", None)
+history = st.session_state.chat_history
+visible = VISIBLE_TURNS - 1 if query else VISIBLE_TURNS  # leave room for the new turn
+earlier, recent = history[:-visible], history[-visible:]
+
+if earlier and st.toggle(f"Show earlier messages ({len(earlier)})", key="show_earlier"):
+    pages = (len(earlier) + EARLIER_PAGE_SIZE - 1) // EARLIER_PAGE_SIZE
+    page = st.number_input("Page (1 = oldest)", min_value=1, max_value=pages, value=pages, key="earlier_page")
+    start = (page - 1) * EARLIER_PAGE_SIZE
+    st.markdown("".join(earlier[start:start + EARLIER_PAGE_SIZE]), unsafe_allow_html=True)
+    st.divider()
+
+# One element for the whole window instead of two per message.
+if recent:
+    st.markdown("".join(recent), unsafe_allow_html=True)
 
-    if message["bot"] == "⏳ Thinking...":
-        try:
-            response = get_rag_response(message["user"])
-            message["bot"] = response or "Sorry, I couldn’t find a confident answer."
-        except Exception:
-            message["bot"] = "Oops! Something went wrong while processing your request."
-        st.rerun()
-
-    st.markdown(bot_card(message["bot"]), unsafe_allow_html=True)
+# -------------------------------
+# Step 2: Answer the New Message (same run)
+# -------------------------------
+if query:
+    # The question shows right away; the answer replaces the spinner below it.
+    turn = st.empty()
+    with turn.container():
+        st.markdown(user_card(query), unsafe_allow_html=True)
+        with st.spinner("⏳ Thinking..."):
+            try:
+                response = get_rag_response(query) or "Sorry, I couldn’t find a confident answer."
+            except Exception:
+                response = "Oops! Something went wrong while processing your request."
+    html = user_card(query) + bot_card(response)
+    turn.markdown(html, unsafe_allow_html=True)
+    history.append(html)
+    del history[:-MAX_STORED_TURNS]
@@ -5,28 +5,309 @@ Core logic for the Zomato RAG chatbot, powered by Google Gemini.
 
 Responsibilities:
 - Loads FAISS index and metadata created with Gemini embeddings.
-- Retrieves context using FAISS similarity search.
+- Warms up in a background thread so the UI can render before resources are ready.
+- Retries initialization with backoff and hot-reloads the index when files on disk change.
+- Optionally attaches zero-copy to an index published in shared memory (shared_index.py).
+- Retrieves context using FAISS similarity search, then re-ranks an over-fetched
+  candidate pool by rating, popularity and price fit (reranker.py).
+- Coalesces concurrent identical queries into one backend call per stage.
+- Caches query embeddings and answers (LRU) and can embed many queries in one request.
+- Logs query frequencies and, after a restart, warms the caches from the most
+  frequent past queries in the background.
+- Bounds every Gemini call with a deadline and circuit breaker on a per-stage worker pool; falls back to a
+  plain list of retrieved dishes when the LLM is unavailable.
 - Generates responses using the Gemini Pro LLM.
+- Optionally records per-stage timings and the outcome of a turn (`trace=`).
+- Captures cProfile / tracemalloc profiles of sampled or requested turns (profiling.py).
 - Fallbacks to structured JSON lookup (manual_context.py) for specific list-based questions.
 """
 
 import os
-import json
+import time
+import atexit
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
 import numpy as np
 import faiss
 import google.generativeai as genai
 from dotenv import load_dotenv
 import traceback
+from shared_index import attach_shared_index, manifest_path
+from single_flight import SingleFlight
+from corpus import load_metadata_corpus
+from query_cache import LRUCache
+from profiling import TurnProfiler
+from query_log import QueryLog
+from reranker import DishFeatures, Reranker
+from manual_context import custom_context
+from concurrent.futures import ThreadPoolExecutor
+from resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, RateLimiter, call_with_deadline, hedged_call
+
+# A loaded (index, metadata, re-ranking features) triple. Swapped in as a single reference
+# so readers never observe an index from one generation with metadata from another.
+ResourceSnapshot = namedtuple("ResourceSnapshot", ["index", "metadata_corpus", "features", "signature", "loaded_at"])
+
+# Configured from RAG_PROFILE_* environment variables; disabled by default.
+turn_profiler = TurnProfiler.from_env()
+
+# Trace dict of the chat turn being served on this thread (see get_rag_response).
+_current_turn = threading.local()
+
+@contextmanager
+def traced_stage(name):
+    """Adds the wall time of the block to the current turn's trace, if one is recorded."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = getattr(_current_turn, "trace", None)
+        if trace is not None:
+            stages = trace.setdefault("stages", {})
+            stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+def _set_outcome(outcome):
+    trace = getattr(_current_turn, "trace", None)
+    if trace is not None:
+        trace["outcome"] = outcome
+
+def normalize_query(query):
+    """Canonical form used to decide whether two queries are 'the same'."""
+    return " ".join(query.lower().split())
+
+def render_dishes(context):
+    """Degraded-mode answer: the retrieved dishes as a list, no LLM involved."""
+    lines = ["Our assistant is taking a short break, but here are the closest matches I found:", ""]
+    for item in context:
+        meta = item['metadata']
+        lines.append(
+            f"- **{meta['dish_name']}** at {meta['restaurant_name']} ({meta['city']}) — "
+            f"₹{meta['price']}, rated {meta['rating']}"
+        )
+    return "\n".join(lines)
 
 class GeminiRagEngine:
-    def __init__(self, index_path="../faiss_index/faiss_index.bin", metadata_path="../faiss_index/metadata_corpus.json"):
+    def __init__(self, index_path="../faiss_index/faiss_index.bin", metadata_path="../faiss_index/metadata_corpus.json",
+                 shared_dir=None, reload_interval=5.0, initial_backoff=1.0, max_backoff=60.0,
+                 embed_timeout=3.0, embed_hedge_after=0.8, generate_timeout=25.0,
+                 embed_concurrency=16, generate_concurrency=32,
+                 embedding_cache_size=4096, answer_cache_size=1024,
+                 query_log_path=None, warmup_queries=200, warmup_rate=1.0,
+                 candidates=100, context_size=4, reranker=None):
         self.index_path = index_path
         self.metadata_path = metadata_path
+        self.shared_dir = shared_dir
         self.llm = None
         self.embedding_model = 'models/embedding-001'
-        self.index = None
-        self.metadata_corpus = None
-        self._load_resources()
+        self.reload_interval = reload_interval
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+        self._snapshot = None
+        self._state = "idle"  # idle -> loading -> ready, or stopped if stop() comes first
+        self._attempts = 0
+        self._reloads = 0
+        self._last_error = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._inflight = SingleFlight()
+        self._embedding_cache = LRUCache(embedding_cache_size)
+        self._answer_cache = LRUCache(answer_cache_size)
+
+        # Checked here rather than failing later in the warm-up thread.
+        if warmup_rate <= 0:
+            raise ValueError(f"warmup_rate must be positive, got {warmup_rate}")
+
+        # Query frequency log used to warm the caches after a restart (None disables).
+        self._query_log = None
+        if query_log_path:
+            self.use_query_log(query_log_path)
+        self.warmup_queries = warmup_queries
+        self.warmup_rate = warmup_rate
+        self._warmup = {"state": "idle", "done": 0, "total": 0}
+
+        # Per-stage deadlines (seconds). embed_hedge_after=None disables hedging.
+        self.embed_timeout = embed_timeout
+        self.embed_hedge_after = embed_hedge_after
+        self.generate_timeout = generate_timeout
+        self._embed_breaker = CircuitBreaker("embedding")
+        self._llm_breaker = CircuitBreaker("llm")
+        # One pool per stage, so a slow LLM never queues embeddings. Calls that miss their
+        # deadline keep their worker until the backend returns; the breaker opens after
+        # `failure_threshold` of them, so that many extra workers keep the stage's
+        # concurrency available to live calls.
+        self._embed_executor = ThreadPoolExecutor(
+            max_workers=embed_concurrency + self._embed_breaker.failure_threshold, thread_name_prefix="gemini-embed"
+        )
+        self._llm_executor = ThreadPoolExecutor(
+            max_workers=generate_concurrency + self._llm_breaker.failure_threshold, thread_name_prefix="gemini-llm"
+        )
+
+        # FAISS over-fetches `candidates` vectors; the best `context_size` after re-ranking go to the LLM.
+        self.candidates = candidates
+        self.context_size = context_size
+        self.reranker = reranker or Reranker.from_env()
+
+    @property
+    def index(self):
+        snapshot = self._snapshot
+        return snapshot.index if snapshot else None
+
+    @property
+    def metadata_corpus(self):
+        snapshot = self._snapshot
+        return snapshot.metadata_corpus if snapshot else None
+
+    def use_query_log(self, path):
+        """Records queries to `path` and warms the caches from it; call before start()."""
+        if self._query_log is None:
+            self._query_log = QueryLog(path)
+            atexit.register(self._query_log.flush)
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    def start(self):
+        """Starts background warm-up (idempotent). Returns immediately."""
+        with self._start_lock:
+            if self._thread is None:
+                self._state = "loading"
+                self._thread = threading.Thread(target=self._run, name="rag-engine-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background loader / file watcher."""
+        self._stop.set()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until resources are loaded or `timeout` seconds pass. Returns readiness."""
+        return self._ready.wait(timeout)
+
+    def health(self):
+        """Returns a small status dict suitable for a health endpoint or the UI."""
+        snapshot = self._snapshot
+        return {
+            "state": self._state,
+            "ready": self.is_ready(),
+            "attempts": self._attempts,
+            "reloads": self._reloads,
+            "last_error": self._last_error,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "num_vectors": snapshot.index.ntotal if snapshot else 0,
+            # Legacy flat metadata has one entry per dish; the normalized form dedups vectors.
+            "num_dishes": getattr(snapshot.metadata_corpus, "num_dishes", len(snapshot.metadata_corpus)) if snapshot else 0,
+            "coalescing": self._inflight.stats(),
+            "embedding_cache": self._embedding_cache.stats(),
+            "answer_cache": self._answer_cache.stats(),
+            "warmup": dict(self._warmup),
+            "embedding_circuit": self._embed_breaker.state,
+            "llm_circuit": self._llm_breaker.state,
+        }
+
+    def _run(self):
+        """Loader thread: initialize with backoff, then watch files for changes."""
+        backoff = self.initial_backoff
+        while True:
+            if self._stop.is_set():
+                self._state = "stopped"  # stopped before a successful load; never report ready
+                return
+            self._attempts += 1
+            try:
+                self._configure_api()
+                self._load_resources()
+                break
+            except Exception as e:
+                self._last_error = str(e)
+                print(f"Initialization attempt {self._attempts} failed, retrying in {backoff:.0f}s.")
+                if self._stop.wait(backoff):
+                    self._state = "stopped"
+                    return
+                backoff = min(backoff * 2, self.max_backoff)
+
+        self._last_error = None
+        self._state = "ready"
+        self._ready.set()
+        if self._query_log and self.warmup_queries:
+            threading.Thread(target=self._warm_caches, name="rag-cache-warmup", daemon=True).start()
+        self._watch_files()
+
+    def _warm_caches(self):
+        """Replays the most frequent logged queries, rate limited, to pre-fill both caches."""
+        queries = self._query_log.top(self.warmup_queries)
+        if not queries:
+            return
+        self._warmup.update(state="running", total=len(queries))
+        print(f"Warming caches with {len(queries)} frequent queries...")
+        started = time.monotonic()
+        for i in range(0, len(queries), 100):
+            try:
+                self.embed_queries(queries[i:i + 100])
+            except Exception as e:
+                print(f"Embedding warm-up failed, answers will embed one by one: {e}")
+                break
+
+        # Embeddings are cheap to batch; replaying answers through the LLM is left
+        # to the one worker holding the claim when several share the log.
+        if not self._query_log.claim_warmup():
+            self._warmup.update(state="embeddings_only")
+            print("Another worker owns answer warm-up; warmed embeddings only.")
+            return
+
+        limiter = RateLimiter(self.warmup_rate)
+        for query in queries:
+            if self._stop.is_set():
+                return
+            limiter.acquire()
+            try:
+                self.answer(query, record=False)
+            except Exception as e:
+                print(f"Warm-up query failed: {e}")
+            self._warmup["done"] += 1
+        self._warmup["state"] = "done"
+        print(f"Cache warm-up finished in {time.monotonic() - started:.0f}s.")
+
+    def _watch_files(self):
+        """Polls file signatures and reloads once a change has settled."""
+        pending = None
+        while not self._stop.wait(self.reload_interval):
+            if self._query_log:
+                try:
+                    self._query_log.maybe_flush()
+                except OSError as e:
+                    print(f"Could not write query log: {e}")
+            try:
+                signature = self._resource_signature()
+            except OSError:
+                continue  # files are mid-replace; try again next tick
+            if signature == self._snapshot.signature:
+                pending = None
+            elif signature != pending:
+                pending = signature  # wait one more interval for writers to finish
+            else:
+                try:
+                    print("Index files changed on disk, reloading...")
+                    self._load_resources()
+                    self._answer_cache.clear()  # answers depend on the index; embeddings do not
+                    self._reloads += 1
+                    self._last_error = None
+                except Exception as e:
+                    self._last_error = f"Reload failed, serving previous index: {e}"
+                    print(self._last_error)
+                pending = None
+
+    def _resource_signature(self):
+        if self.shared_dir:
+            # The manifest is replaced atomically by the publisher on every swap.
+            stats = [os.stat(manifest_path(self.shared_dir))]
+        else:
+            stats = [os.stat(path) for path in (self.index_path, self.metadata_path)]
+        return tuple((st.st_mtime_ns, st.st_size) for st in stats)
 
     def _configure_api(self):
         """Loads API key and configures the generative AI model."""
@@ -38,38 +319,116 @@ class GeminiRagEngine:
         self.llm = genai.GenerativeModel('gemini-2.5-pro')
 
     def _load_resources(self):
-        """Loads the FAISS index and metadata."""
+        """Loads the FAISS index and metadata, then swaps them in atomically."""
+        if turn_profiler.profile_load:
+            meta = {"index_path": self.index_path, "metadata_path": self.metadata_path, "shared_dir": self.shared_dir}
+            with turn_profiler.capture("load_resources", meta):
+                return self._read_resources()
+        return self._read_resources()
+
+    def _read_resources(self):
         try:
-            self._configure_api()
+            signature = self._resource_signature()
+            if self.shared_dir:
+                index, metadata_corpus, generation = attach_shared_index(self.shared_dir)
+                self._snapshot = ResourceSnapshot(index, metadata_corpus, DishFeatures.from_corpus(metadata_corpus),
+                                                  signature, time.time())
+                print(f"Attached to shared index generation {generation} in {self.shared_dir}.")
+                return
             print("Loading FAISS index...")
-            self.index = faiss.read_index(self.index_path)
+            index = faiss.read_index(self.index_path)
             print("Loading metadata corpus...")
-            with open(self.metadata_path, 'r', encoding='utf-8') as f:
-                self.metadata_corpus = json.load(f)
+            metadata_corpus = load_metadata_corpus(self.metadata_path)
+            if index.ntotal != len(metadata_corpus):
+                raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(metadata_corpus)} entries.")
+            self._snapshot = ResourceSnapshot(index, metadata_corpus, DishFeatures.from_corpus(metadata_corpus),
+                                              signature, time.time())
             print("Gemini RAG Engine resources loaded successfully.")
         except Exception as e:
             print(f"Error loading resources: {e}")
             raise
 
-    def find_relevant_dishes(self, query, k=5):
-        """Finds the top k most relevant dishes for a given query."""
-        if self.index is None or self.metadata_corpus is None:
-            raise RuntimeError("Resources are not loaded.")
-        
-        # Generate embedding for the query
+    def embed_query(self, query):
+        """Returns the normalized query embedding, shared by concurrent identical queries."""
+        key = normalize_query(query)
+        with traced_stage("embed"):
+            query_embedding = self._embedding_cache.get(key)
+            if query_embedding is None:
+                query_embedding = self._inflight.do(("embed", key), self._guarded_embed_query, query)
+            return query_embedding
+
+    def _guarded_embed_query(self, query):
+        query_embedding = self._embed_breaker.call(
+            hedged_call, self._embed_executor, self.embed_timeout, self.embed_hedge_after, self._embed_query, query
+        )
+        self._embedding_cache.put(normalize_query(query), query_embedding)
+        return query_embedding
+
+    def embed_queries(self, queries, timeout=30.0):
+        """
+        Embeds many queries with a single API request and stores them in the
+        embedding cache, so the following find_relevant_dishes calls skip the
+        per-query request. Already-cached queries are not re-sent.
+        """
+        pending = {}
+        for query in queries:
+            key = normalize_query(query)
+            if key not in self._embedding_cache:
+                pending.setdefault(key, query)
+        if not pending:
+            return 0
+        embeddings = self._embed_breaker.call(
+            call_with_deadline, self._embed_executor, timeout, self._embed_queries, list(pending.values())
+        )
+        for key, query_embedding in zip(pending, embeddings):
+            self._embedding_cache.put(key, query_embedding[np.newaxis, :])
+        return len(pending)
+
+    def _embed_queries(self, queries):
+        response = genai.embed_content(
+            model=self.embedding_model,
+            content=queries,
+            task_type="RETRIEVAL_QUERY",
+            request_options={"timeout": self.embed_timeout * 4}
+        )
+        query_embeddings = np.array(response['embedding']).astype('float32')
+        faiss.normalize_L2(query_embeddings)
+        return query_embeddings
+
+    def _embed_query(self, query):
         query_embedding_response = genai.embed_content(
             model=self.embedding_model,
             content=query,
-            task_type="RETRIEVAL_QUERY"
+            task_type="RETRIEVAL_QUERY",
+            request_options={"timeout": self.embed_timeout}
         )
         query_embedding = np.array([query_embedding_response['embedding']]).astype('float32')
         faiss.normalize_L2(query_embedding)
+        return query_embedding
+
+    def find_relevant_dishes(self, query, k=None):
+        """Finds the top k (default `context_size`) most relevant dishes for a given query."""
+        k = k or self.context_size
+        if self._snapshot is None:
+            raise RuntimeError("Resources are not loaded.")
+        with traced_stage("retrieve"):
+            return self._inflight.do(("retrieve", normalize_query(query), k), self._find_relevant_dishes, query, k)
+
+    def _find_relevant_dishes(self, query, k):
+        snapshot = self._snapshot
+
+        # Generate embedding for the query
+        query_embedding = self.embed_query(query)
+
+        # Search the FAISS index for a wider candidate pool
+        scores, indices = snapshot.index.search(query_embedding, max(self.candidates, k))
+
+        # Re-rank the pool and keep the best k
+        with traced_stage("rerank"):
+            best = self.reranker.rank(query, scores[0], indices[0], snapshot.features, k)
 
-        # Search the FAISS index
-        distances, indices = self.index.search(query_embedding, k)
-        
         # Retrieve the corresponding metadata
-        results = [self.metadata_corpus[i] for i in indices[0]]
+        results = [snapshot.metadata_corpus[i] for i in best]
         return results
 
     def generate_response(self, query, context):
@@ -92,40 +451,118 @@ class GeminiRagEngine:
         Your response:
         """
         
-        response = self.llm.generate_content(prompt)
+        # Identical question + identical context => identical prompt; generate it once.
+        key = ("generate", normalize_query(query), tuple(item['text_chunk'] for item in context))
+        with traced_stage("generate"):
+            return self._inflight.do(key, self._guarded_generate, prompt)
+
+    def _guarded_generate(self, prompt):
+        return self._llm_breaker.call(call_with_deadline, self._llm_executor, self.generate_timeout, self._generate, prompt)
+
+    def _generate(self, prompt):
+        response = self.llm.generate_content(prompt, request_options={"timeout": self.generate_timeout})
         return response.text
 
+    def answer(self, query, record=True):
+        """One full retrieve -> generate turn, degrading instead of failing when Gemini is unhealthy."""
+        key = normalize_query(query)
+        if record and self._query_log:
+            self._query_log.record(key)
+        cached = self._answer_cache.get(key)
+        if cached is not None:
+            _set_outcome("cached")
+            return cached
+
+        try:
+            retrieved_context = self.find_relevant_dishes(query)
+        except (CircuitOpenError, DeadlineExceeded) as e:
+            print(f"Retrieval unavailable: {e}")
+            _set_outcome("retrieval_unavailable")
+            return "Our search service is slow to respond right now. Please try again in a moment."
+
+        try:
+            response = self.generate_response(query, retrieved_context)
+        except Exception as e:
+            print(f"LLM unavailable, answering in degraded mode: {e}")
+            _set_outcome("degraded")
+            return render_dishes(retrieved_context)
+        self._answer_cache.put(key, response)
+        _set_outcome("answered")
+        return response
+
 # -------------------------------
 # Main RAG Handler
 # -------------------------------
-try:
-    # Initialize the engine once when the module is loaded
-    rag_engine_instance = GeminiRagEngine()
-except Exception as e:
-    rag_engine_instance = None
-    print(f"FATAL: Could not initialize Gemini RAG Engine: {e}")
-
-def get_rag_response(query: str) -> str:
+# Construction is cheap; resources load on a background thread on first use.
+# Set RAG_SHARED_INDEX_DIR to attach to an index published by shared_index.py.
+# RAG_QUERY_LOG sets where query frequencies are kept for cache warm-up. Off unless
+# set here or enabled by the serving app (get_engine(query_log_path=...)), so tools
+# that merely import this module never write it.
+rag_engine_instance = GeminiRagEngine(
+    shared_dir=os.getenv("RAG_SHARED_INDEX_DIR"),
+    query_log_path=os.getenv("RAG_QUERY_LOG") or None
+)
+
+# How long a chat turn waits for a still-warming engine before giving up.
+READY_WAIT_SECONDS = 10
+
+def get_engine(query_log_path: str = None) -> GeminiRagEngine:
+    """
+    Returns the shared engine, kicking off background warm-up if needed.
+    `query_log_path` turns on the query log (see `GeminiRagEngine.use_query_log`).
+    """
+    if query_log_path:
+        rag_engine_instance.use_query_log(query_log_path)
+    return rag_engine_instance.start()
+
+def get_rag_response(query: str, trace: dict = None, profile: bool = False, record: bool = True) -> str:
     """
     Core retrieval-augmented generation logic.
+
+    Pass a dict as `trace` to receive per-stage wall times in seconds
+    (`trace["stages"]`) and how the turn ended (`trace["outcome"]`).
+    With `profile=True` (or when sampled) the turn is captured by `turn_profiler`.
+    Tools replaying synthetic traffic pass `record=False` to keep it out of the query log.
     """
-    if rag_engine_instance is None:
-        return "The chatbot engine could not be started. Please check the logs."
+    if turn_profiler.should_profile(profile):
+        trace = trace if trace is not None else {}
+        with turn_profiler.capture("turn", {"query": query, "trace": trace}):
+            return _traced_response(query, trace, record)
+    return _traced_response(query, trace, record)
+
+def _traced_response(query, trace, record):
+    _current_turn.trace = trace
+    try:
+        with traced_stage("total"):
+            return _respond(query, record)
+    finally:
+        _current_turn.trace = None
+
+def _respond(query, record=True):
+    engine = get_engine()
 
     user_input = query.strip()
 
     # Manual override for predefined structured lookups
     if any(key in user_input.lower() for key in ["restaurant-list", "menu-list", "serves-dish-item"]):
+        _set_outcome("command")
         return custom_context(user_input)
 
     if not user_input:
+        _set_outcome("empty")
         return "Please ask something meaningful."
 
+    with traced_stage("wait_ready"):
+        ready = engine.wait_until_ready(READY_WAIT_SECONDS)
+    if not ready:
+        print(f"Engine not ready: {engine.health()}")
+        _set_outcome("not_ready")
+        return "The chatbot engine is still starting up. Please try again in a moment."
+
     try:
-        retrieved_context = rag_engine_instance.find_relevant_dishes(user_input)
-        response = rag_engine_instance.generate_response(user_input, retrieved_context)
-        return response
+        return engine.answer(user_input, record=record)
     except Exception as e:
         print("❌ Exception in get_rag_response:")
         traceback.print_exc()
+        _set_outcome("error")
         return "Oops! Something went wrong while processing your request."
@@ -1,9 +1,23 @@
+import os
+import sys
 import json
 
+# The chunk builder and review parser live with the engine's corpus reader.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Zomato_chatbot_app'))
+from corpus import parse_num_reviews
+
+# Text embedded for every dish. Filled with the dish row merged over its restaurant row.
+CHUNK_TEMPLATE = (
+    "{dish_name} is a dish served at {restaurant_name}, which is a {cuisine} restaurant in {city}. "
+    "It is described as: {description}. The price of the dish is {price} and it has a rating of {rating}. "
+    "The restaurant has an overall rating of {restaurant_rating}."
+)
+
 def transform_knowledge_base(input_path, output_path):
     """
     Transforms the knowledge base from the original format to an optimized
-    format for a vector database.
+    format for a vector database: a restaurant table plus dish rows that
+    reference it by position.
     """
     try:
         with open(input_path, 'r', encoding='utf-8') as f:
@@ -15,45 +29,42 @@ def transform_knowledge_base(input_path, output_path):
         print(f"Error: The file {input_path} is not a valid JSON file.")
         return
 
-    optimized_corpus = []
+    restaurants = []
+    dishes = []
 
     for restaurant in knowledge_base:
-        restaurant_name = restaurant.get("restaurant_name", "N/A")
-        city = restaurant.get("city", "N/A")
-        cuisine = restaurant.get("available_cuisine", "N/A")
-        restaurant_rating = restaurant.get("restaurant_rating", "N/A")
+        restaurant_id = len(restaurants)
+        restaurants.append({
+            "restaurant_name": restaurant.get("restaurant_name", "N/A"),
+            "city": restaurant.get("city", "N/A"),
+            "cuisine": restaurant.get("available_cuisine", "N/A"),
+            "restaurant_rating": restaurant.get("restaurant_rating", "N/A"),
+        })
 
         if "restaurant_menu" in restaurant and restaurant["restaurant_menu"] is not None:
             for dish in restaurant["restaurant_menu"]:
-                dish_name = dish.get("dish_name", "N/A")
                 description = dish.get("description", "")
                 if description is None:
                     description = ""
-                price = dish.get("price", "N/A")
-                rating = dish.get("rating", "N/A")
-                dish_type = dish.get("dish_type", "N/A")
-
-                text_chunk = (
-                    f"{dish_name} is a dish served at {restaurant_name}, which is a {cuisine} restaurant in {city}. "
-                    f"It is described as: {description}. The price of the dish is {price} and it has a rating of {rating}. "
-                    f"The restaurant has an overall rating of {restaurant_rating}."
-                )
 
-                metadata = {
-                    "restaurant_name": restaurant_name,
-                    "city": city,
-                    "cuisine": cuisine,
-                    "dish_name": dish_name,
-                    "price": price,
-                    "rating": rating,
-                    "dish_type": dish_type,
-                }
-
-                optimized_corpus.append({
-                    "text_chunk": text_chunk,
-                    "metadata": metadata
+                dishes.append({
+                    "restaurant": restaurant_id,
+                    "dish_name": dish.get("dish_name", "N/A"),
+                    "description": description,
+                    "price": dish.get("price", "N/A"),
+                    "rating": dish.get("rating", "N/A"),
+                    "num_reviews": parse_num_reviews(dish.get("num_reviews")),
+                    "dish_type": dish.get("dish_type", "N/A"),
                 })
 
+    # Restaurant fields are stored once; each dish's text chunk is rebuilt on
+    # demand from CHUNK_TEMPLATE instead of being repeated in every row.
+    optimized_corpus = {
+        "chunk_template": CHUNK_TEMPLATE,
+        "restaurants": restaurants,
+        "dishes": dishes,
+    }
+
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(optimized_corpus, f, indent=4)
@@ -62,4 +73,4 @@ def transform_knowledge_base(input_path, output_path):
         print(f"Error: Could not write to the file {output_path}.")
 
 if __name__ == "__main__":
-    transform_knowledge_base('Structured_data/knowledge_base.json', 'Structured_data/optimized_corpus.json')
\ No newline at end of file
+    transform_knowledge_base('Structured_Data/knowledge_base.json', 'Structured_Data/optimized_corpus.json')
\ No newline at end of file